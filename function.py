@@ -1,77 +1,169 @@
 from __future__ import print_function
 import datetime
-import pickle
+import functools
 import os.path
-from googleapiclient.discovery import build
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
 
-# If modifying these scopes, delete the file token.pickle.
+# If modifying these scopes, delete the file token.json.
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
+TOKEN_FILE = 'token.json'
+LEGACY_TOKEN_FILE = 'token.pickle'
+# 有効期限までの残り秒数がこれを下回ったら事前に更新する
+REFRESH_MARGIN_SECONDS = 300
+
+def _save_credentials(creds):
+    """Save credentials as JSON, replacing token.json atomically."""
+    # 書き込み途中で失敗しても壊れたtoken.jsonが残らないよう、一時ファイル経由で置き換える
+    data = creds.to_json()
+    tmp_path = TOKEN_FILE + '.tmp'
+    with open(tmp_path, 'w') as token:
+        token.write(data)
+    os.replace(tmp_path, TOKEN_FILE)
+
+def _migrate_legacy_token():
+    """Convert an old token.pickle to token.json, deleting it only on success."""
+    # 旧形式のトークンがある場合のみpickleを読み込む
+    import pickle
+    try:
+        with open(LEGACY_TOKEN_FILE, 'rb') as token:
+            creds = pickle.load(token)
+        _save_credentials(creds)
+        # 保存に成功した場合のみ旧トークンを削除する
+        os.remove(LEGACY_TOKEN_FILE)
+    except Exception as e:
+        print(f"旧トークンの移行に失敗しました: {e}")
+
+def _needs_refresh(creds):
+    """Return True if the access token is missing or about to expire."""
+    # アクセストークンが無い場合は無効とみなす
+    if not creds.token:
+        return True
+    if creds.expiry is None:
+        return False
+    remaining = (creds.expiry - datetime.datetime.utcnow()).total_seconds()
+    return remaining < REFRESH_MARGIN_SECONDS
 
 def get_credentials():
     """Get valid credentials with longer expiration time."""
     creds = None
-    if os.path.exists('token.pickle'):
-        with open('token.pickle', 'rb') as token:
-            creds = pickle.load(token)
+    if not os.path.exists(TOKEN_FILE) and os.path.exists(LEGACY_TOKEN_FILE):
+        _migrate_legacy_token()
+    if os.path.exists(TOKEN_FILE):
+        try:
+            creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
+        except (ValueError, OSError) as e:
+            # 項目不足や破損したtoken.jsonは無いものとして扱い、再認証する
+            print(f"token.jsonを読み込めないため再認証します: {e}")
+            creds = None
+
+    # 期限切れ間近なら、API呼び出しで401になる前に更新しておく
+    if creds and creds.refresh_token and _needs_refresh(creds):
+        from google.auth.exceptions import RefreshError
+        from google.auth.transport.requests import Request
+        try:
+            creds.refresh(Request())
+        except RefreshError as e:
+            # リフレッシュに失敗した場合は新規認証を行う
+            creds = None
+        else:
+            try:
+                _save_credentials(creds)
+            except OSError as e:
+                # 保存できなくても更新済みの認証情報はそのまま使う
+                print(f"token.jsonの保存に失敗しました: {e}")
             
     if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            try:
-                creds.refresh(Request())
-            except Exception as e:
-                # リフレッシュに失敗した場合は新規認証を行う
-                creds = None
-                
-        if not creds:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'credentials.json', 
-                SCOPES
-            )
-            # フローの設定を修正
-            flow.authorization_url(
-                access_type='offline',
-                prompt='consent'
-            )
-            creds = flow.run_local_server(port=0)
+        # 初回認証時のみ必要なため、ここで読み込む
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        flow = InstalledAppFlow.from_client_secrets_file(
+            'credentials.json', 
+            SCOPES
+        )
+        # フローの設定を修正
+        flow.authorization_url(
+            access_type='offline',
+            prompt='consent'
+        )
+        creds = flow.run_local_server(port=0)
             
         # 認証情報を保存
-        with open('token.pickle', 'wb') as token:
-            pickle.dump(creds, token)
+        _save_credentials(creds)
             
     return creds
 
-def todays_event():
+def _use_orjson():
+    """Parse API responses with orjson when it is installed.
+
+    orjson only handles 64-bit integers; depending on the version, larger
+    integers are either rejected or silently parsed as floats. Calendar
+    responses carry IDs as strings, so this is acceptable here, and a
+    rejected body falls back to the stdlib parser.
+    """
+    try:
+        import orjson
+    except ImportError:
+        return
+    import json
+    from googleapiclient.model import JsonModel
+
+    def deserialize(self, content):
+        # orjsonはbytesをそのまま受け取れるため、デコードを省略する
+        try:
+            body = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            if isinstance(content, bytes):
+                content = content.decode('utf-8')
+            # 64bitを超える整数などorjsonが扱えない場合は標準のjsonで解析する
+            try:
+                body = json.loads(content)
+            except ValueError:
+                return content
+        if self._data_wrapper and 'data' in body:
+            body = body['data']
+        return body
+
+    JsonModel.deserialize = deserialize
+
+@functools.lru_cache(maxsize=1)
+def _service():
+    """Build the Calendar service once and reuse it within the process."""
+    from googleapiclient.discovery import build
+    _use_orjson()
+    creds = get_credentials()
+    # 同梱のディスカバリ文書を使い、毎回のHTTP取得を省略する
+    return build('calendar', 'v3', credentials=creds,
+                 static_discovery=True, cache_discovery=False)
+
+def todays_event(now=None):
     """Shows basic usage of the Google Calendar API.
     Prints the start and name of the next 10 events on the user's calendar.
+
+    :param now: timezone-aware current time; defaults to the time of the call.
     """
     try:
-        creds = get_credentials()
-        service = build('calendar', 'v3', credentials=creds)
+        service = _service()
 
         # Call the Calendar API
-        now = datetime.datetime.utcnow().isoformat() + 'Z' # 'Z' indicates UTC time
-        events_result = service.events().list(calendarId='primary', timeMin=now,
+        # 本日（ローカル時刻）の範囲に絞ってサーバー側で絞り込む
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        today = now.astimezone().date()
+        start_of_day = datetime.datetime.combine(today, datetime.time.min).astimezone()
+        end_of_day = datetime.datetime.combine(today, datetime.time.max).astimezone()
+        events_result = service.events().list(calendarId='primary',
+                                            timeMin=start_of_day.isoformat(),
+                                            timeMax=end_of_day.isoformat(),
                                             maxResults=10, singleEvents=True,
                                             orderBy='startTime').execute()
         events = events_result.get('items', [])
 
-        today = datetime.date.today()
+        # timeMinは終了時刻で判定されるため、前日以前に始まった予定を除外する
+        today_str = today.isoformat()
         return_list = []
-
-        if not events:
-            return return_list
-            
         for event in events:
-            if event['start'].get('dateTime'):
-                start = event['start'].get('dateTime')
-            else:
-                start = event['start'].get('date')
-            event_date = datetime.datetime.strptime(start[:10], '%Y-%m-%d').date()
-            if event_date == today:
+            start = event['start'].get('dateTime') or event['start'].get('date')
+            if start[:10] == today_str:
                 return_list.append(event['summary'])
-        
+
         return return_list
         
     except Exception as e:
@@ -1,11 +1,22 @@
 import os
 import sys
+import atexit
 import logging
-from typing import List, Dict
+import logging.handlers
+import queue
+from typing import Any, List, Dict, Optional
 import configparser
 import datetime
-import io
-from trello import TrelloClient
+import json
+import time
+import argparse
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from trello import TrelloClient, Board
+from trello import List as TrelloList
 from trello.exceptions import ResourceUnavailable
 
 # ログエンコーディングを明示的に設定
@@ -21,32 +32,93 @@ def setup_logging():
     # ログファイルのパス
     log_file_path = os.path.join(log_dir, 'trello_todo.log')
     
-    # ロガーの設定
-    logging.basicConfig(
-        level=logging.INFO, 
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            # ファイルハンドラ
-            logging.FileHandler(log_file_path, encoding='utf-8'),
-            # コンソールハンドラ
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
-    
     # 文字化け防止のためのエンコーディング設定
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+    for stream in (sys.stdout, sys.stderr):
+        if hasattr(stream, 'reconfigure'):
+            stream.reconfigure(encoding='utf-8')
+    
+    # 出力先ハンドラ（書き込みはQueueListenerのスレッドで行う）
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    # ファイルハンドラ
+    file_handler = logging.FileHandler(log_file_path, encoding='utf-8')
+    file_handler.setFormatter(formatter)
+    # コンソールハンドラ
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+    
+    # ロガーにはキューへの投入のみを行うハンドラを設定
+    log_queue = queue.Queue(-1)
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    
+    listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler)
+    listener.start()
+    # 終了時にキューに残ったログを書き出す
+    atexit.register(listener.stop)
 
 # ログ設定を最初に呼び出し
 setup_logging()
 logger = logging.getLogger(__name__)
 
+# カード追加の同時実行数（Trelloのレート制限を考慮して小さめに設定）
+MAX_WORKERS = 4
+# 429 (Too Many Requests) 時の再試行回数と初期待機秒数
+MAX_RETRIES = 3
+BACKOFF_SECONDS = 1.0
+# リストIDキャッシュのファイル名と有効期間（秒）
+# 毎日の実行で期限切れにならないよう、実行間隔より十分長くする
+LIST_CACHE_FILE = 'list_cache.json'
+LIST_CACHE_TTL = 7 * 24 * 60 * 60
+
+def _logged(message, exceptions=Exception):
+    """
+    例外をログに記録してから再送出するデコレータ
+    
+    :param message: ログに出力するメッセージ
+    :param exceptions: 記録対象の例外クラス
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except exceptions as e:
+                logger.error(f"{message}: {e}")
+                raise
+        return wrapper
+    return decorator
+
+# 定義済みのTODOリスト
+EVERYDAY_TODO = (
+    '読書', 
+    '筋トレ or ランニング',
+    '技術に触れる',
+    'プロテイン1',
+    'プロテイン2',
+    '朝のサプリ',
+    '夜のサプリ',
+    'pao1',
+    'pao2',
+    'くすり',
+    '歯磨き',
+    'ワセリン',
+)
+
+# 曜日ごとのTODO（該当なしの曜日は省略）
+DAY_TODOS = {
+    "Fri": ('Workday', 'CATS'),
+    "Sat": ('トイレ掃除',),
+    "Sun": ('Skin Care',),
+}
+
 class TrelloTodoManager:
-    def __init__(self, config_path='config.ini'):
+    def __init__(self, config_path='config.ini', refresh_lists=False):
         """
         Trelloボード管理クラスの初期化
         
         :param config_path: 設定ファイルのパス
+        :param refresh_lists: Trelloからリストを再取得してキャッシュを更新するか
         """
         try:
             # 設定ファイルの読み込み
@@ -58,172 +130,291 @@ class TrelloTodoManager:
             # Trelloクライアントの初期化
             self.client = self._initialize_trello_client()
             
-            # ボードとリストの取得
-            self.board = self._get_board()
-            self.todo_list = self.board.list_lists()[0]
-            self.done_list = self.board.list_lists()[1]
-            
-            # 定義済みのTODOリスト
-            self.everyday_todo = [
-                '読書', 
-                '筋トレ or ランニング',
-                '技術に触れる',
-                'プロテイン1',
-                'プロテイン2',
-                '朝のサプリ',
-                '夜のサプリ',
-                'pao1',
-                'pao2',
-                'くすり',
-                '歯磨き',
-                'ワセリン',
-            ]
-            
-            self.classes = {
-                "Mon": [],
-                "Tue": [],
-                "Wed": [],
-                "Thu": [],
-                "Fri": ['Workday', 'CATS'],
-                "Sat": ['トイレ掃除'],
-                "Sun": ['Skin Care'],
-            }
-        
-        except (configparser.Error, KeyError) as e:
+            # ボードとリストの取得（キャッシュがあればAPIを呼ばない）
+            self.list_cache_path = os.path.join(
+                os.path.dirname(os.path.abspath(config_path)), LIST_CACHE_FILE
+            )
+            list_ids = None if refresh_lists else self._load_list_ids()
+            if list_ids and not self._cached_lists_are_open(list_ids):
+                logger.info("キャッシュしたリストが無効なため、リストを再取得します")
+                list_ids = None
+            if list_ids:
+                self.board = Board(client=self.client, board_id=os.environ["id_board"])
+                self.todo_list = TrelloList(self.board, list_ids['todo_list_id'])
+                self.done_list = TrelloList(self.board, list_ids['done_list_id'])
+            else:
+                self._fetch_lists()
+        
+        except configparser.Error as e:
+            # 必要な項目の不足（KeyError）は_set_environment_variablesで記録済み
             logger.error(f"設定の読み込みに失敗しました: {e}")
             raise
         except ResourceUnavailable as e:
             logger.error(f"Trelloへの接続に失敗しました: {e}")
             raise
 
-    def _load_config(self, config_path: str) -> configparser.ConfigParser:
+    def _load_config(self, config_path: str) -> Dict[str, Dict[str, str]]:
         """
         設定ファイルを安全に読み込む
         
+        解析結果は更新日時と共にキャッシュし、設定ファイルが
+        変更されていなければ次回以降はキャッシュから読み込む
+        
         :param config_path: 設定ファイルのパス
-        :return: 設定オブジェクト
+        :return: セクションごとの設定値の辞書
         """
-        config = configparser.ConfigParser()
         if not os.path.exists(config_path):
             logger.error(f"設定ファイル {config_path} が見つかりません")
             raise FileNotFoundError(f"設定ファイル {config_path} が存在しません")
         
-        config.read(config_path, encoding='utf-8')
+        mtime = os.path.getmtime(config_path)
+        cache_path = config_path + '.cache'
+        try:
+            with open(cache_path, encoding='utf-8') as f:
+                cache = json.load(f)
+            if cache.get('mtime') == mtime:
+                return cache['config']
+        except (OSError, ValueError, KeyError):
+            pass
+        
+        parser = configparser.ConfigParser()
+        parser.read(config_path, encoding='utf-8')
+        config = {section: dict(parser[section]) for section in parser.sections()}
+        
+        try:
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                json.dump({'mtime': mtime, 'config': config}, f, ensure_ascii=False)
+        except OSError as e:
+            # キャッシュの保存失敗は処理継続に影響しない
+            logger.warning(f"設定キャッシュの保存に失敗しました: {e}")
         return config
 
+    @_logged("設定ファイルに必要な項目が不足しています", KeyError)
     def _set_environment_variables(self):
         """環境変数を安全に設定する"""
-        try:
-            login_section = self.config['login']
-            env_vars = {
-                'trello_key': login_section['api_key'],
-                'trello_secret': login_section['trello_secret'],
-                'id_board': login_section['bd_id'],
-                'token': login_section['token']
-            }
-            
-            for key, value in env_vars.items():
-                os.environ[key] = value
+        login_section = self.config['login']
+        env_vars = {
+            'trello_key': login_section['api_key'],
+            'trello_secret': login_section['trello_secret'],
+            'id_board': login_section['bd_id'],
+            'token': login_section['token']
+        }
         
-        except KeyError as e:
-            logger.error(f"設定ファイルに必要な項目が不足しています: {e}")
-            raise
+        for key, value in env_vars.items():
+            os.environ[key] = value
 
+    @_logged("Trelloクライアントの初期化に失敗しました")
     def _initialize_trello_client(self) -> TrelloClient:
         """
         Trelloクライアントを初期化する
         
         :return: Trelloクライアント
         """
-        try:
-            return TrelloClient(
-                api_secret=os.environ["trello_secret"],
-                api_key=os.environ["trello_key"],
-                token=os.environ["token"]  # トークンを追加
-            )
-        except Exception as e:
-            logger.error(f"Trelloクライアントの初期化に失敗しました: {e}")
-            raise
+        return TrelloClient(
+            api_secret=os.environ["trello_secret"],
+            api_key=os.environ["trello_key"],
+            token=os.environ["token"],  # トークンを追加
+            http_service=self._create_session()
+        )
+
+    def _create_session(self) -> requests.Session:
+        """
+        接続を再利用するHTTPセッションを作成する
+        
+        :return: リトライ設定済みのセッション
+        """
+        session = requests.Session()
+        session.headers.update({'Accept': 'application/json'})
+        retry = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            # 再試行が尽きたらレスポンスを返し、py-trello側でResourceUnavailableにする
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=8,
+            max_retries=retry
+        )
+        session.mount('https://', adapter)
+        return session
 
+    @_logged("ボードの取得に失敗しました", ResourceUnavailable)
     def _get_board(self):
         """
         Trelloボードを取得する
         
         :return: Trelloボード
         """
+        return self.client.get_board(os.environ["id_board"])
+
+    def _fetch_lists(self):
+        """ボードとリストをTrelloから取得し、リストIDをキャッシュに保存する"""
+        self.board = self._get_board()
+        lists = self.board.list_lists()
+        self.todo_list, self.done_list = lists[0], lists[1]
+        self._save_list_ids()
+
+    def _load_list_ids(self) -> Optional[Dict[str, Any]]:
+        """
+        キャッシュからリストIDを読み込む
+        
+        :return: リストIDの辞書（キャッシュが無い・無効な場合はNone）
+        """
         try:
-            return self.client.get_board(os.environ["id_board"])
-        except ResourceUnavailable as e:
-            logger.error(f"ボードの取得に失敗しました: {e}")
-            raise
+            with open(self.list_cache_path, encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if cache.get('board_id') != os.environ["id_board"]:
+            return None
+        if time.time() - cache.get('fetched_at', 0) > LIST_CACHE_TTL:
+            logger.info("リストIDのキャッシュが期限切れのため再取得します")
+            return None
+        if not cache.get('todo_list_id') or not cache.get('done_list_id'):
+            return None
+        return cache
+
+    def _cached_lists_are_open(self, list_ids: Dict[str, Any]) -> bool:
+        """
+        キャッシュしたリストが存在し、アーカイブされていないか確認する
+        
+        両リストをTrelloのバッチAPIで1回のリクエストにまとめて取得する
+        
+        :param list_ids: キャッシュから読み込んだリストIDの辞書
+        :return: 両リストとも利用可能ならTrue
+        """
+        urls = ','.join(
+            f"/lists/{list_ids[key]}" for key in ('todo_list_id', 'done_list_id')
+        )
+        results = self.client.fetch_json('/batch', query_params={'urls': urls})
+        # 成功した要素は {"200": {...}} の形式で返る（404などはそれ以外のキー）
+        return len(results) == 2 and all(
+            isinstance(result.get('200'), dict) and not result['200'].get('closed')
+            for result in results
+        )
+
+    def _save_list_ids(self):
+        """取得したリストIDをキャッシュに保存する"""
+        cache = {
+            'board_id': os.environ["id_board"],
+            'todo_list_id': self.todo_list.id,
+            'done_list_id': self.done_list.id,
+            'fetched_at': time.time(),
+        }
+        try:
+            with open(self.list_cache_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f)
+        except OSError as e:
+            # キャッシュの保存失敗は処理継続に影響しない
+            logger.warning(f"リストIDのキャッシュ保存に失敗しました: {e}")
 
-    def manage_daily_todos(self):
+    def manage_daily_todos(self, schedule: Optional[List[str]] = None,
+                           now: Optional[datetime.datetime] = None):
         """
         日々のTODOを管理する
+        
+        :param schedule: 併せて追加するスケジュールのリスト
+        :param now: 基準とする現在時刻（省略時は呼び出し時点）
         """
         try:
             # 前日のTODOリストが空の場合、Doneリストをアーカイブ
-            if not self.todo_list.list_cards():
+            # （空のTODOリストのアーカイブは不要なため省略）
+            cards = self.todo_list.list_cards()
+            if not cards:
                 logger.info("TODOリストが空のため、Doneリストをアーカイブします")
                 self.done_list.archive_all_cards()
-            
-            # 現在のTODOリストをアーカイブ
-            self.todo_list.archive_all_cards()
+            else:
+                # 現在のTODOリストをアーカイブ
+                self.todo_list.archive_all_cards()
 
-            # 毎日のTODOを追加
-            for todo in self.everyday_todo:
-                self.todo_list.add_card(todo)
-
-            # 曜日ごとのTODOを追加
-            current_day = datetime.datetime.now().strftime('%a')
-            self.add_day_specific_todos(current_day)
+            # 毎日・曜日ごと・スケジュールのTODOをまとめて追加
+            now = now or datetime.datetime.now(datetime.timezone.utc)
+            current_day = now.astimezone().strftime('%a')
+            todos = list(EVERYDAY_TODO)
+            todos.extend(DAY_TODOS.get(current_day, ()))
+            todos.extend(schedule or [])
+            self._post_cards_batch(todos)
 
         except Exception as e:
             logger.error(f"日々のTODO管理中にエラーが発生しました: {e}")
             raise
 
-    def add_day_specific_todos(self, day: str):
+    def _post_cards_batch(self, titles: List[str]):
         """
-        曜日固有のTODOを追加する
+        複数のカードを並行してTODOリストに追加する
+        
+        同時実行数はMAX_WORKERSで制限し、並行実行でも元の順序が
+        崩れないよう各カードに位置を指定する
+        （アーカイブ直後の空のリストに追加する前提で、位置は1から振る）
         
-        :param day: 曜日の略称
+        :param titles: 追加するカード名のリスト
         """
-        try:
-            day_todos = self.classes.get(day, [])
-            for todo in day_todos:
-                self.todo_list.add_card(todo)
-        except Exception as e:
-            logger.error(f"{day}の固有TODOの追加に失敗しました: {e}")
+        if not titles:
+            return
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = [
+                executor.submit(self._add_card_with_backoff, title, position)
+                for position, title in enumerate(titles, start=1)
+            ]
+            # 例外があれば呼び出し元に伝播させる
+            for future in futures:
+                future.result()
 
-    def add_schedule_todos(self, schedule: List[str]):
+    def _add_card_with_backoff(self, title: str, position: int):
         """
-        スケジュールからTODOを追加する
+        カードを追加する（429の場合は指数バックオフで再試行）
         
-        :param schedule: スケジュールのリスト
+        :param title: カード名
+        :param position: リスト内の位置
         """
-        try:
-            for event in schedule:
-                self.todo_list.add_card(event)
-        except Exception as e:
-            logger.error(f"スケジュールTODOの追加に失敗しました: {e}")
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                return self.todo_list.add_card(title, position=position)
+            except ResourceUnavailable as e:
+                if getattr(e, '_status', None) != 429 or attempt == MAX_RETRIES:
+                    raise
+                wait = BACKOFF_SECONDS * (2 ** attempt)
+                logger.warning(f"レート制限のため{wait}秒後に再試行します: {title}")
+                time.sleep(wait)
+
+def parse_args():
+    """
+    コマンドライン引数を解析する
+    
+    :return: 解析結果
+    """
+    parser = argparse.ArgumentParser(description='TrelloのTODOリストを更新する')
+    parser.add_argument(
+        '--refresh-lists',
+        action='store_true',
+        help='リストIDのキャッシュを無視してTrelloから再取得する'
+    )
+    return parser.parse_args()
 
 def main():
     """
     メインエントリーポイント
     """
     try:
+        args = parse_args()
+
         # カスタム関数のインポートは既存の関数を想定
         from function import todays_event
 
+        # 実行中に日付が変わっても同じ日として扱うため、現在時刻は一度だけ取得
+        now = datetime.datetime.now(datetime.timezone.utc)
+
         # TODOマネージャーの初期化
-        todo_manager = TrelloTodoManager()
+        todo_manager = TrelloTodoManager(refresh_lists=args.refresh_lists)
         
-        # 日々のTODO管理
-        todo_manager.manage_daily_todos()
+        # 本日のスケジュールを取得
+        today_schedule = todays_event(now)
         
-        # 本日のスケジュールを取得して追加
-        today_schedule = todays_event()
-        todo_manager.add_schedule_todos(today_schedule)
+        # 日々のTODO管理（スケジュールもまとめて追加）
+        todo_manager.manage_daily_todos(today_schedule, now=now)
         
         logger.info("TODOリストの更新が正常に完了しました")
     
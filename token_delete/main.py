@@ -1,5 +1,6 @@
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # ロギングの設定
@@ -12,33 +13,45 @@ logging.basicConfig(
     ]
 )
 
+def _delete_one(file_path):
+    """
+    ファイルを1件削除する
+    
+    Args:
+        file_path (str): 削除するファイルのフルパス
+    """
+    try:
+        os.remove(file_path)
+        logging.info(f'ファイルを削除しました: {file_path}')
+    except FileNotFoundError:
+        logging.warning(f'ファイルが存在しません: {file_path}')
+    except IsADirectoryError:
+        logging.warning(f'指定されたパスはファイルではありません: {file_path}')
+    except PermissionError:
+        # WindowsやmacOSではディレクトリの削除もPermissionErrorになる
+        if os.path.isdir(file_path):
+            logging.warning(f'指定されたパスはファイルではありません: {file_path}')
+        else:
+            logging.error(f'権限エラー - ファイルにアクセスできません: {file_path}')
+    except Exception as e:
+        logging.error(f'エラーが発生しました - {file_path}: {str(e)}')
+
 def delete_specific_files(file_paths):
     """
-    指定されたファイルを削除する
+    指定されたファイルを並行して削除する
     
     Args:
         file_paths (list): 削除するファイルのフルパスのリスト
     """
-    for file_path in file_paths:
-        try:
-            if os.path.exists(file_path):
-                if os.path.isfile(file_path):
-                    os.remove(file_path)
-                    logging.info(f'ファイルを削除しました: {file_path}')
-                else:
-                    logging.warning(f'指定されたパスはファイルではありません: {file_path}')
-            else:
-                logging.warning(f'ファイルが存在しません: {file_path}')
-                
-        except PermissionError:
-            logging.error(f'権限エラー - ファイルにアクセスできません: {file_path}')
-        except Exception as e:
-            logging.error(f'エラーが発生しました - {file_path}: {str(e)}')
+    if not file_paths:
+        return
+    with ThreadPoolExecutor(max_workers=min(32, len(file_paths))) as executor:
+        list(executor.map(_delete_one, file_paths))
 
 if __name__ == "__main__":
     # 削除するファイルのパスをリストで指定
     FILES_TO_DELETE = [
-        r"C:\Users\Yu\Documents\Codes\Trello_Automation\token.pickle",
+        r"C:\Users\Yu\Documents\Codes\Trello_Automation\token.json",
     ]
     
     # ファイル削除の実行